@@ -1,9 +1,12 @@
 import os
+import shutil
+import tempfile
 import adsk, adsk.core, adsk.fusion
+from concurrent.futures import ThreadPoolExecutor
 from . import parts
 from . import parser
 from . import manager
-from collections import Counter, defaultdict
+from . import utils
 
 def visible_to_stl(design, save_dir, root, accuracy, body_dict, sub_mesh, body_mapper, _app):  
     """
@@ -23,59 +26,170 @@ def visible_to_stl(design, save_dir, root, accuracy, body_dict, sub_mesh, body_m
         list of all bodies to use for stl export
     """
           
+    # Export top-level occurrences
+    occ = root.occurrences.asList
+
+    # Single pass over the occurrence list: visibility and entityToken are
+    # each read once per occurrence (both cross the Fusion API boundary),
+    # and occurrences without mapped bodies never reach the export loop
+    export_jobs = []
+    for oc in occ:
+        if not oc.isLightBulbOn:
+            continue
+        bodies = body_mapper.get(oc.entityToken)
+        if not bodies:
+            continue
+        export_jobs.append((utils.format_name(oc.name), bodies))
+
+    # Nothing visible to export; skip creating the scratch document entirely
+    if not export_jobs:
+        return
+
     # create a single exportManager instance
     exporter = design.exportManager
 
     # Setup new document for saving to
     des: adsk.fusion.Design = _app.activeProduct
 
-    newDoc: adsk.core.Document = _app.documents.add(adsk.core.DocumentTypes.FusionDesignDocumentType, True) 
+    newDoc: adsk.core.Document = _app.documents.add(adsk.core.DocumentTypes.FusionDesignDocumentType, True)
     newDes: adsk.fusion.Design = newDoc.products.itemByProductType('DesignProductType')
     newRoot = newDes.rootComponent
 
     # get the script location
     save_dir = os.path.join(save_dir,'meshes')
-    try: os.mkdir(save_dir)
-    except: pass
-
-    # Export top-level occurrences
-    occ = root.occurrences.asList
-    # hack for correct stl placement by turning off all visibility first
-    visible_components = []
-    for oc in occ:
-        if oc.isLightBulbOn:
-            visible_components.append(oc)
-
-    # Make sure no repeated body names
-    body_count = Counter()
-
-    for oc in visible_components:
-        # Create a new exporter in case its a memory thing
-        exporter = design.exportManager
-
-        occName = oc.name.replace(':', '_').replace(' ','')
-        
-        component_exporter(exporter, newRoot, body_mapper[oc.entityToken], os.path.join(save_dir,f'{occName}'))
-
-        if sub_mesh:
-            # get the bodies associated with this top-level component (which will contain sub-components)
-            bodies = body_mapper[oc.entityToken]
-
-            for body in bodies:
-                if body.isLightBulbOn:
-
+    os.makedirs(save_dir, exist_ok=True)
+
+    # Make sure no repeated body names; plain dict of running indices
+    body_count = {}
+
+    # Stage exports in a scratch directory and move finished files into place
+    # from a small worker pool. The Fusion API is not thread-safe, so every
+    # export call stays on the main thread; only completed files cross the
+    # thread boundary. When a DRAM-backed filesystem is available the stage
+    # directory lives there, so exports complete at memory speed and the
+    # disk writeback overlaps with the next body's export.
+    workers = os.cpu_count() or 1
+    stage_root = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    stage_dir = tempfile.mkdtemp(prefix='descriptor_stl_', dir=stage_root)
+    pool = ThreadPoolExecutor(max_workers=workers)
+    pending = []
+    # bound the number of staged files so memory stays capped
+    max_inflight = 2 * workers
+
+    # Identical instanced geometry (bolts, fasteners, ...) is exported once
+    # and copied for every further instance instead of re-running the kernel
+    body_seen = {}
+    comp_seen = {}
+    dup_jobs = []
+    move_jobs = {}
+
+    # the finally block keeps worker threads and the scratch directory from
+    # leaking when a Fusion export call raises mid-loop
+    try:
+        for occName, occ_bodies in export_jobs:
+            # Collect the bodies for this occurrence (which will contain sub-components)
+            # along with the stl target for each, so one base feature edit covers
+            # both the combined export and the per-body exports
+            jobs = []
+            comp_sig = []
+            for body in occ_bodies:
+                # visibility is read once here; _bulk_export gets only visible bodies
+                if not body.isLightBulbOn:
+                    continue
+
+                save_name = None
+                sig = _body_signature(body)
+                comp_sig.append(sig)
+
+                if sub_mesh:
                     # Since there are alot of similar names, we need to store the parent component as well in the filename
-                    body_name = body.name.replace(':','_').replace(' ','')
-                    body_name_cnt = f'{body_name}_{body_count[body_name]}'
-                    body_count[body_name] += 1
-
-                    save_name = os.path.join(save_dir,f'{occName}_{body_name_cnt}')
-
-                    body_exporter(exporter, newRoot, body, save_name)
+                    body_name = utils.format_name(body.name)
+                    cnt = body_count.get(body_name, 0)
+                    body_count[body_name] = cnt + 1
+                    body_name_cnt = f'{body_name}_{cnt}'
+
+                    final_name = os.path.join(save_dir,f'{occName}_{body_name_cnt}.stl')
+                    if sig in body_seen:
+                        dup_jobs.append((body_seen[sig], final_name))
+                    else:
+                        body_seen[sig] = final_name
+                        save_name = os.path.join(stage_dir,f'{occName}_{body_name_cnt}.stl')
+
+                jobs.append((body, save_name))
+
+            # If an occurrence with this exact body makeup was already exported,
+            # its combined stl can be copied as well
+            comp_sig = tuple(comp_sig)
+            comp_final = os.path.join(save_dir, f'{occName}.stl')
+            if comp_sig in comp_seen and not any(name for _, name in jobs):
+                dup_jobs.append((comp_seen[comp_sig], comp_final))
+                continue
+            comp_seen[comp_sig] = comp_final
+
+            for staged in _bulk_export(exporter, newRoot, jobs, os.path.join(stage_dir,f'{occName}')):
+                final_name = os.path.join(save_dir, os.path.basename(staged))
+                job = pool.submit(shutil.move, staged, final_name)
+                move_jobs[final_name] = job
+                pending.append(job)
+                if len(pending) >= max_inflight:
+                    pending.pop(0).result()
+
+        # Copies wait until the original file has been moved into place
+        for src, dst in dup_jobs:
+            pending.append(pool.submit(_copy_after, move_jobs[src], src, dst))
+
+        # Wait for the writers to finish before the add-in reports completion
+        for job in pending:
+            job.result()
+    finally:
+        pool.shutdown(wait=True)
+        shutil.rmtree(stage_dir, ignore_errors=True)
+
+
+def _body_signature(body):
+    ''' Identity signature for a body, used to recognize instanced
+    geometry that would export byte-identical stl files
+
+    revisionId is preferred: it is cheap to read and tracks the actual
+    geometry, so instances of the same component match while edited or
+    mirrored copies do not. Because the proxies passed in here export in
+    world coordinates, the occurrence transform is part of the signature;
+    the same component placed at two poses produces two different stl
+    files and must not dedupe. The physicalProperties fallback includes
+    the world center of mass, which covers both the mirror and the pose
+    case.
 
+    Parameters
+    ----------
+    body : adsk.fusion.BRepBody
+        body to fingerprint
 
-def component_exporter(exportMgr, newRoot, body_lst, filename):
-    ''' Copy a component to a new document, save, then delete. 
+    Returns
+    -------
+    tuple
+        hashable signature of the body
+    '''
+    rev = getattr(body, 'revisionId', None)
+    if rev:
+        occ = body.assemblyContext
+        pose = None
+        if occ is not None:
+            pose = tuple(round(v, 9) for v in occ.transform2.asArray())
+        return (body.name, rev, pose)
+    prop = body.physicalProperties
+    com = prop.centerOfMass
+    return (body.name, round(prop.volume, 9), round(prop.area, 9),
+            round(com.x, 9), round(com.y, 9), round(com.z, 9))
+
+def _copy_after(job, src, dst):
+    ''' Copy src to dst once the move job that produced src has finished '''
+    job.result()
+    shutil.copy(src, dst)
+
+def _bulk_export(exportMgr, newRoot, jobs, comp_filename):
+    ''' Copy bodies to a new document inside a single base feature edit,
+    export, then delete. One startEdit/finishEdit/deleteMe cycle covers the
+    whole occurrence instead of one per body.
 
     Modified from solution proposed by BrianEkins https://EkinsSolutions.com
 
@@ -85,10 +199,17 @@ def component_exporter(exportMgr, newRoot, body_lst, filename):
         _description_
     newRoot : _type_
         _description_
-    body_lst : _type_
-        _description_
-    filename : _type_
-        _description_
+    jobs : list
+        (body, filename) pairs of visible bodies; filenames carry the .stl
+        extension so they match what lands on disk, and a filename of None
+        means the body is only part of the combined export
+    comp_filename : str
+        path (without extension) for the combined stl of all bodies
+
+    Returns
+    -------
+    list
+        paths of the stl files written
     '''
 
     tBrep = adsk.fusion.TemporaryBRepManager.get()
@@ -96,73 +217,75 @@ def component_exporter(exportMgr, newRoot, body_lst, filename):
     bf = newRoot.features.baseFeatures.add()
     bf.startEdit()
 
-    for body in body_lst:
-        if not body.isLightBulbOn: continue
+    added = []
+    for body, filename in jobs:
         tBody = tBrep.copy(body)
-        newRoot.bRepBodies.add(tBody, bf)
+        added.append((newRoot.bRepBodies.add(tBody, bf), filename))
 
     bf.finishEdit()
-    stlOptions = exportMgr.createSTLExportOptions(newRoot, f'{filename}.stl')
+
+    written = []
+    stlOptions = exportMgr.createSTLExportOptions(newRoot, f'{comp_filename}.stl')
     exportMgr.execute(stlOptions)
+    written.append(f'{comp_filename}.stl')
 
-    bf.deleteMe()
+    for newBody, filename in added:
+        if filename is None: continue
+        stl_options = exportMgr.createSTLExportOptions(newBody, filename)
+        stl_options.sendToPrintUtility = False
+        stl_options.isBinaryFormat = True
+        # stl_options.meshRefinement = accuracy
+        exportMgr.execute(stl_options)
+        written.append(filename)
 
-def body_exporter(exportMgr, newRoot, body, filename):
-    tBrep = adsk.fusion.TemporaryBRepManager.get()
-    
-    tBody = tBrep.copy(body)
+    bf.deleteMe()
 
-    bf = newRoot.features.baseFeatures.add()
-    bf.startEdit()
-    newRoot.bRepBodies.add(tBody, bf)
-    bf.finishEdit()
+    return written
 
-    newBody = newRoot.bRepBodies[0]
+# Fixed preamble of the urdf document; formatted once per export
+_URDF_HEADER = '''<?xml version="1.0" ?>
+<robot name="{name}">
 
-    stl_options = exportMgr.createSTLExportOptions(newBody, filename)
-    stl_options.sendToPrintUtility = False
-    stl_options.isBinaryFormat = True
-    # stl_options.meshRefinement = accuracy
-    exportMgr.execute(stl_options)                
+<material name="silver">
+  <color rgba="0.700 0.700 0.700 1.000"/>
+</material>
 
-    bf.deleteMe()
+'''
 
 class Writer:
 
     def __init__(self) -> None:
         pass
 
-    def write_link(self, config, file_name):
-        ''' Write links information into urdf file_name
-        
+    def write_link(self, config, chunks):
+        ''' Collect links information for the urdf
+
         Parameters
         ----------
         config : Configurator
             root nodes instance of configurator class
-        file_name: str
-            urdf full path
+        chunks: list
+            xml chunks to be joined and written
 
         '''
 
-        with open(file_name, mode='a', encoding="utf-8") as f:
-            for _, link in config.links.items():  
-                f.write(f'{link.link_xml}\n')
+        for _, link in config.links.items():
+            chunks.append(f'{link.link_xml}\n')
+
+    def write_joint(self, chunks, config):
+        ''' Collect joints and transmission information for the urdf
 
-    def write_joint(self, file_name, config):
-        ''' Write joints and transmission information into urdf file_name
-            
         Parameters
         ----------
-        file_name: str
-            urdf full path
+        chunks: list
+            xml chunks to be joined and written
         config : Configurator
             root nodes instance of configurator class
 
         '''
-        
-        with open(file_name, mode='a', encoding="utf-8") as f:
-            for _, joint in config.joints.items():
-                f.write(f'{joint.joint_xml}\n')
+
+        for _, joint in config.joints.items():
+            chunks.append(f'{joint.joint_xml}\n')
 
 
     def write_urdf(self, save_dir, config):
@@ -174,25 +297,25 @@ class Writer:
             path to save file
         config : Configurator
             root nodes instance of configurator class
-        '''        
+        '''
 
         save_dir = os.path.join(save_dir,'urdf')
-        try: os.mkdir(save_dir)
-        except: pass
+        os.makedirs(save_dir, exist_ok=True)
         file_name = os.path.join(save_dir, f'{config.name}.urdf')  # the name of urdf file
 
-        with open(file_name, mode='w', encoding="utf-8") as f:
-            f.write('<?xml version="1.0" ?>\n')
-            f.write(f'<robot name="{config.name}">\n\n')
-            f.write('<material name="silver">\n')
-            f.write('  <color rgba="0.700 0.700 0.700 1.000"/>\n')
-            f.write('</material>\n\n')
+        # Build the whole document in memory and write it in one call,
+        # instead of a syscall per line
+        chunks = [_URDF_HEADER.format(name=config.name)]
+
+        self.write_link(config, chunks)
+        self.write_joint(chunks, config)
 
-        self.write_link(config, file_name)
-        self.write_joint(file_name, config)
+        chunks.append('</robot>\n')
 
-        with open(file_name, mode='a') as f:
-            f.write('</robot>\n')
+        # 1 MiB buffer so the single joined write reaches the kernel in
+        # as few write calls as possible
+        with open(file_name, mode='w', encoding="utf-8", buffering=1<<20) as f:
+            f.write(''.join(chunks))
 
 def write_hello_pybullet(robot_name, save_dir):
     ''' Writes a sample script which loads the URDF in pybullet
@@ -236,5 +359,4 @@ p.disconnect()
 """
     hello_pybullet = hello_pybullet.replace('TEMPLATE.urdf', robot_urdf)
     with open(file_name, mode='w') as f:
-        f.write(hello_pybullet)
-        f.write('\n')
+        f.write(f'{hello_pybullet}\n')
@@ -4,8 +4,26 @@ from functools import partial
 import adsk 
 
 from . import parser
+from . import parts
 from . import io
 
+# Lookup tables for the UI dropdown values, resolved once at import
+_UNIT_SCALE = {'mm': 0.001, 'cm': 0.01, 'm': 1.0}
+
+_INERTIA_ACCURACY = {
+    'Low': adsk.fusion.CalculationAccuracy.LowCalculationAccuracy,
+    'Medium': adsk.fusion.CalculationAccuracy.MediumCalculationAccuracy,
+    'High': adsk.fusion.CalculationAccuracy.VeryHighCalculationAccuracy,
+}
+
+_MESH_REFINEMENT = {
+    'Low': adsk.fusion.MeshRefinementSettings.MeshRefinementLow,
+    'Medium': adsk.fusion.MeshRefinementSettings.MeshRefinementMedium,
+    'High': adsk.fusion.MeshRefinementSettings.MeshRefinementHigh,
+}
+
+_JOINT_ORDER = {'Parent': ('p','c'), 'Child': ('c','p')}
+
 
 class Manager:
     ''' Manager class for setting params and generating URDF 
@@ -41,41 +59,30 @@ class Manager:
         '''        
         self.save_mesh = save_mesh
         self.sub_mesh = sub_mesh
-        if document_units=='mm': doc_u = 0.001
-        elif document_units=='cm': doc_u = 0.01
-        elif document_units=='m': doc_u = 1.0
 
-        if target_units=='mm': tar_u = 0.001
-        elif target_units=='cm': tar_u = 0.01
-        elif target_units=='m': tar_u = 1.0
-        
-        self.scale = tar_u / doc_u       
-
-        if inertia_precision == 'Low':
-            self.inert_accuracy = adsk.fusion.CalculationAccuracy.LowCalculationAccuracy
-        elif inertia_precision == 'Medium':
-            self.inert_accuracy = adsk.fusion.CalculationAccuracy.MediumCalculationAccuracy
-        elif inertia_precision == 'High':
-            self.inert_accuracy = adsk.fusion.CalculationAccuracy.VeryHighCalculationAccuracy
-
-        if mesh_resolution == 'Low':
-            self.mesh_accuracy = adsk.fusion.MeshRefinementSettings.MeshRefinementLow
-        elif mesh_resolution == 'Medium':
-            self.mesh_accuracy = adsk.fusion.MeshRefinementSettings.MeshRefinementMedium
-        elif mesh_resolution == 'High':
-            self.mesh_accuracy = adsk.fusion.MeshRefinementSettings.MeshRefinementHigh
-
-        if joint_order == 'Parent':
-            self.joint_order = ('p','c')
-        elif joint_order == 'Child':
-            self.joint_order = ('c','p')
-        else:
+        try:
+            self.scale = _UNIT_SCALE[target_units] / _UNIT_SCALE[document_units]
+        except KeyError:
+            raise ValueError(f'Units {document_units} -> {target_units} not supported')
+
+        self.inert_accuracy = _INERTIA_ACCURACY[inertia_precision]
+        self.mesh_accuracy = _MESH_REFINEMENT[mesh_resolution]
+
+        try:
+            self.joint_order = _JOINT_ORDER[joint_order]
+        except KeyError:
             raise ValueError(f'Order method not supported')
         
         # set the target platform
         self.target_platform = target_platform
+        # transmissions are ros_control specific; skip generating them for
+        # platforms that would never read them
+        parts.Joint.emit_transmissions = target_platform not in ('None', 'pyBullet')
+
+        # scene configuration shared between preview() and run()
+        self._config = None
 
-        # Set directory 
+        # Set directory
         self._set_dir(save_dir)
 
     def _set_dir(self, save_dir):
@@ -88,11 +95,34 @@ class Manager:
         '''        
         # set the names        
         robot_name = Manager.root.name.split()[0]
-        package_name = robot_name + '_description'
+        package_name = f'{robot_name}_description'
 
         self.save_dir = os.path.join(save_dir, package_name)
-        try: os.mkdir(self.save_dir)
-        except: pass     
+        os.makedirs(self.save_dir, exist_ok=True)
+
+    def _get_config(self):
+        ''' Configure the scene once and reuse it, so a preview followed
+        by generate only walks the occurrence tree a single time.
+
+        Trade-off: edits to the document between clicks are not picked up
+        while the export settings stay identical, since the UI only
+        rebuilds the Manager (and with it this cache) when an input
+        changes.
+
+        Returns
+        -------
+        Configurator
+            configured scene for the current settings
+        '''
+        if self._config is None:
+            config = parser.Configurator(Manager.root)
+            config.inertia_accuracy = self.inert_accuracy
+            config.joint_order = self.joint_order
+            config.scale = self.scale
+            config.sub_mesh = self.sub_mesh
+            config.get_scene_configuration()
+            self._config = config
+        return self._config
 
     def preview(self):
         ''' Get all joints in the scene for previewing joints
@@ -101,28 +131,18 @@ class Manager:
         -------
         dict
             mapping of joint names with parent-> child relationship
-        '''        
-        
-        config = parser.Configurator(Manager.root)
-        config.inertia_accuracy = self.inert_accuracy
-        config.joint_order = self.joint_order
-        config.scale = self.scale
+        '''
+
         ## Return array of tuples (parent, child)
-        config.get_scene_configuration()
-        return config.get_joint_preview()
+        return self._get_config().get_joint_preview()
 
 
     def run(self):
         ''' process the scene, including writing to directory and
         exporting mesh, if applicable
-        '''        
-        
-        config = parser.Configurator(Manager.root)
-        config.inertia_accuracy = self.inert_accuracy
-        config.scale = self.scale
-        config.joint_order = self.joint_order
-        config.sub_mesh = self.sub_mesh
-        config.get_scene_configuration()
+        '''
+
+        config = self._get_config()
         config.parse()
 
         # --------------------
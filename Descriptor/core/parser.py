@@ -6,11 +6,16 @@ import copy
 import adsk, adsk.core, adsk.fusion
 from . import transforms
 from . import parts
+from . import utils
 from collections import Counter, defaultdict
 
 class Hierarchy:
     ''' hierarchy of the design space '''
 
+    # one instance per occurrence; slots keep large assemblies compact and
+    # make the attribute reads in the traversals cheaper
+    __slots__ = ('children', 'component', 'name', '_parent')
+
     def __init__(self, component) -> None:
         ''' Initialize Hierarchy class to parse document and define component relationships.
         Uses a recursive traversal (based off of fusion example) and provides helper functions
@@ -37,82 +42,47 @@ class Hierarchy:
         ''' get all children and sub children of this instance '''
 
         child_map = {}
-        parent_stack = set()
-        parent_stack.update(self.get_children())
-        while len(parent_stack) != 0:
-            # Pop an element form the stack (order shouldn't matter)
-            tmp = parent_stack.pop()
+        # plain list as the stack; no hashing needed and the resulting dict
+        # keeps a stable insertion order
+        stack = list(self.children)
+        while stack:
+            tmp = stack.pop()
             # Add this child to the map
             # use the entity token, more accurate than the name of the component (since there are multiple)
-            child_map[tmp.component.entityToken] = tmp 
-            # Check if this child has children
-            if len(tmp.get_children())> 0:
-                # add them to the parent_stack
-                parent_stack.update(tmp.get_children())
+            child_map[tmp.component.entityToken] = tmp
+            stack.extend(tmp.children)
 
         return child_map
 
     def get_flat_body(self):
-        ''' get a flat list of all components and child components '''
-
-        child_list = []
-        body_list = []
-        parent_stack = set()
-
-        child_set = list(self.get_all_children().values())
-
-        if len(child_set) == 0:
-            body_list.append([self.component.bRepBodies.item(x) for x in range(0, self.component.bRepBodies.count) ])
-
-        child_list = [x.children for x in child_set if len(x.children)>0]
-        childs = []
-        for c in child_list:
-            for _c in c:
-                childs.append(_c)
-
-        parent_stack.update(childs)
-        closed_set = set()
-
-        while len(parent_stack) != 0:
-            # Pop an element form the stack (order shouldn't matter)
-            tmp = parent_stack.pop()
-            closed_set.add(tmp)
-            # Get any bodies directly associated with this component
-            if tmp.component.bRepBodies.count > 0:
-                body_list.append([tmp.component.bRepBodies.item(x) for x in range(0, tmp.component.bRepBodies.count) ])
-
-            # Check if this child has children
-            if len(tmp.children)> 0:
-                # add them to the parent_stack
-                child_set = list(self.get_all_children().values())
-
-                child_list = [x.children for x in child_set if len(x.children)>0]
-                childs = []
-                for c in child_list:
-                    for _c in c:
-                        if _c not in closed_set:
-                            childs.append(_c)
-
-                parent_stack.update(childs)
+        ''' get a flat list of all bodies of this component and its children '''
 
         flat_bodies = []
-        for body in body_list:
-            flat_bodies.extend(body)
+        # Single DFS over the subtree; the hierarchy is a tree (children are
+        # only attached during traverse), so no visited set is needed
+        stack = [self]
+        while stack:
+            tmp = stack.pop()
+            bodies = tmp.component.bRepBodies
+            # each .count/.item call crosses the fusion api boundary,
+            # so touch them as few times as possible
+            count = bodies.count
+            if count > 0:
+                item = bodies.item
+                flat_bodies.extend(item(x) for x in range(count))
+            stack.extend(tmp.children)
 
         return flat_bodies
 
     def get_all_parents(self):
         ''' get all the parents of this instance '''
 
-        child_stack = set()
-        child_stack.add(self)
+        # a node has exactly one parent, so this is a straight pointer walk
         parent_map = []
-        while len(child_stack) != 0:
-            tmp = child_stack.pop()
-            if tmp.parent is None:
-                return parent_map
-            parent_map.append(tmp.parent.component.entityToken)    
-            child_stack.add(tmp.parent)
+        tmp = self._parent
+        while tmp is not None:
+            parent_map.append(tmp.component.entityToken)
+            tmp = tmp._parent
 
         return parent_map
             
@@ -127,34 +97,46 @@ class Hierarchy:
         self._parent = v
 
     @staticmethod
-    def traverse(occurrences, parent=None):
-        '''Recursively create class instances and define a parent->child structure
-        Based on the fusion 360 API docs
-        
+    def traverse(occurrences, parent=None, out_map=None):
+        '''Iteratively create class instances and define a parent->child structure
+        Based on the fusion 360 API docs. Uses an explicit stack instead of
+        recursion, so deep assemblies don't pay python call overhead per node
+        or risk hitting the recursion limit.
+
         Parameters
         ----------
         occurrences : [type]
             [description]
         parent : [type], optional
             [description], by default None
+        out_map : dict, optional
+            entityToken -> Hierarchy map filled while the nodes are created,
+            saving callers a second full walk of the tree
         Returns
         -------
         Hierarchy
             Instance of the class
-        '''        
-        
-        for i in range(0, occurrences.count):
-            occ = occurrences.item(i)
-            cur = Hierarchy(occ)
-
-            if parent is None: 
-                pass
-            else: 
-
-                parent._add_child(cur)
+        '''
 
-            if occ.childOccurrences:
-                Hierarchy.traverse(occ.childOccurrences, parent=cur)
+        cur = None
+        stack = [(occurrences, parent)]
+        while stack:
+            occs, parent = stack.pop()
+            count = occs.count
+            item = occs.item
+            for i in range(0, count):
+                occ = item(i)
+                cur = Hierarchy(occ)
+
+                if out_map is not None:
+                    out_map[occ.entityToken] = cur
+
+                if parent is not None:
+                    parent._add_child(cur)
+
+                children = occ.childOccurrences
+                if children:
+                    stack.append((children, cur))
         return cur
 
 class Configurator:
@@ -180,6 +162,11 @@ class Configurator:
         self.sub_mesh = False
         self.joints_dict = {}
         self.body_dict = {}
+        # per-entityToken caches, each bRepBodies.item() call crosses the
+        # fusion api boundary so enumerate each component only once
+        self._bodies_cache = {}
+        self._visible_bodies_cache = {}
+        self._flat_body_cache = {}
         self.links = {} # Link class
         self.joints = {} # Joint class for writing to file
         self.joint_order = ('p','c') # Order of joints defined by components
@@ -197,8 +184,10 @@ class Configurator:
         self.root_node = Hierarchy(self.root)
         occ_list=self.root.occurrences.asList
 
-        Hierarchy.traverse(occ_list, self.root_node)
-        self.component_map = self.root_node.get_all_children()
+        # component_map is filled while the hierarchy is built, so no second
+        # walk over the finished tree is needed
+        self.component_map = {}
+        Hierarchy.traverse(occ_list, self.root_node, out_map=self.component_map)
 
         self.get_sub_bodies()
 
@@ -206,6 +195,44 @@ class Configurator:
 
 
 
+    def _bodies_of(self, node):
+        ''' cached list of the bodies directly on a node's component
+
+        Parameters
+        ----------
+        node : Hierarchy
+            node whose component bodies are requested
+
+        Returns
+        -------
+        list
+            bodies of the component
+        '''
+        token = node.component.entityToken
+        bodies = self._bodies_cache.get(token)
+        if bodies is None:
+            component = node.component
+            bodies = [component.bRepBodies.item(x) for x in range(0, component.bRepBodies.count)]
+            self._bodies_cache[token] = bodies
+        return bodies
+
+    def _visible_bodies_of(self, node):
+        ''' cached visible (lightbulb on) subset of _bodies_of '''
+        token = node.component.entityToken
+        bodies = self._visible_bodies_cache.get(token)
+        if bodies is None:
+            bodies = [x for x in self._bodies_of(node) if x.isLightBulbOn]
+            self._visible_bodies_cache[token] = bodies
+        return bodies
+
+    def _flat_body(self, token):
+        ''' cached Hierarchy.get_flat_body result per entityToken '''
+        bodies = self._flat_body_cache.get(token)
+        if bodies is None:
+            bodies = self.component_map[token].get_flat_body()
+            self._flat_body_cache[token] = bodies
+        return bodies
+
     def get_sub_bodies(self):
         ''' temp fix for ensuring that a top-level component is associated with bodies'''
 
@@ -214,34 +241,28 @@ class Configurator:
 
         # for k,v in self.component_map.items():
         for v in self.root_node.children:
-            
+
             children = set()
             children.update(v.children)
 
-            top_level_body = [v.component.bRepBodies.item(x) for x in range(0, v.component.bRepBodies.count) ]
-            top_level_body = [x for x in top_level_body if x.isLightBulbOn]
-            
+            top_level_body = self._visible_bodies_of(v)
+
             # add to the body mapper
             self.body_mapper[v.component.entityToken].extend(top_level_body)
 
-            top_body_name = [x.name for x in top_level_body]
-
             while children:
                 cur = children.pop()
                 children.update(cur.children)
-                sub_level_body = [cur.component.bRepBodies.item(x) for x in range(0, cur.component.bRepBodies.count) ]
-                sub_level_body = [x for x in sub_level_body if x.isLightBulbOn ]
-                
-                # add to this body mapper again 
+                sub_level_body = self._visible_bodies_of(cur)
+
+                # add to this body mapper again
                 self.body_mapper[v.component.entityToken].extend(sub_level_body)
-                
-                sub_body_name = [x.name for x in sub_level_body]
 
-        for oc in self.occ:       
+        for oc in self.occ:
             # Iterate through bodies, only add mass of bodies that are visible (lightbulb)
             # body_cnt = oc.bRepBodies.count
             # mapped_comp =self.component_map[oc.entityToken]
-            body_lst = self.component_map[oc.entityToken].get_flat_body()
+            body_lst = self._flat_body(oc.entityToken)
 
     def get_joint_preview(self):
         ''' Get the scenes joint relationships without calculating links 
@@ -259,7 +280,6 @@ class Configurator:
 
         self._inertia()
         self._joints()
-        self._base()
         self._build_links()
         self._build_joints()
 
@@ -268,72 +288,76 @@ class Configurator:
         ''' Name of the root component '''
         return self.root.name.split()[0]
 
-    def _base(self):
-        ''' Get the base link(s) '''
-        
-        for oc in self.occ:
-            if oc.isGrounded:
-                name = oc.name
-                self.base_links.add(name)
-
     def _inertia(self):
         '''
-        Define inertia values
-        
+        Define inertia values and collect the base link(s).
+        The grounded check shares this loop so the occurrence list is only
+        walked once per parse.
+
         Notes
         -----
         Original Authors: @syuntoku, @yanshil
         Modified by @cadop
         '''
-        
-        for oc in self.occ:       
-            occs_dict = {}
+
+        # Gather phase: pull everything we need from fusion per occurrence
+        names = []
+        masses = []
+        centers_of_mass = []
+        moments = []
+        for oc in self.occ:
+            # grounded occurrences double as base link candidates
+            if oc.isGrounded:
+                self.base_links.add(oc.name)
+
             prop = oc.getPhysicalProperties(self.inertia_accuracy)
-            
-            occs_dict['name'] = oc.name
 
             mass = prop.mass  # kg
 
             # Iterate through bodies, only add mass of bodies that are visible (lightbulb)
             # body_cnt = oc.bRepBodies.count
             # mapped_comp =self.component_map[oc.entityToken]
-            body_lst = self.component_map[oc.entityToken].get_flat_body()
-
-            if len(body_lst) > 0:
-                for body in body_lst:
-                    # Check if this body is hidden
-                    #  
-                    # body = oc.bRepBodies.item(i)
-                    if not body.isLightBulbOn:
-                        mass -= body.physicalProperties.mass
-
+            body_lst = self._flat_body(oc.entityToken)
 
-            occs_dict['mass'] = mass
-            center_of_mass = [_/self.scale for _ in prop.centerOfMass.asArray()] ## cm to m
-            occs_dict['center_of_mass'] = center_of_mass
+            # Subtract the mass of hidden bodies. physicalProperties is a
+            # heavy fusion call, so only probe it for bodies that are
+            # actually hidden; in the common all-visible case this loop does
+            # one isLightBulbOn read per body and nothing else
+            hidden = [body for body in body_lst if not body.isLightBulbOn]
+            if hidden:
+                mass -= sum(body.physicalProperties.mass for body in hidden)
 
+            names.append(oc.name)
+            masses.append(mass)
+            centers_of_mass.append([_/self.scale for _ in prop.centerOfMass.asArray()]) ## cm to m
 
             # https://help.autodesk.com/view/fusion360/ENU/?guid=GUID-ce341ee6-4490-11e5-b25b-f8b156d7cd97
             (_, xx, yy, zz, xy, yz, xz) = prop.getXYZMomentsOfInertia()
-            moment_inertia_world = [_ / self.inertia_scale for _ in [xx, yy, zz, xy, yz, xz] ] ## kg / cm^2 -> kg/m^2
+            moments.append([_ / self.inertia_scale for _ in [xx, yy, zz, xy, yz, xz] ]) ## kg / cm^2 -> kg/m^2
 
-            occs_dict['inertia'] = transforms.origin2center_of_mass(moment_inertia_world, center_of_mass, mass)
+        # Compute phase: all parallel-axis shifts in one vectorized call
+        inertias = transforms.batch_origin2center_of_mass(moments, centers_of_mass, masses)
 
-            self.inertial_dict[oc.name] = occs_dict
+        for name, mass, center_of_mass, inertia in zip(names, masses, centers_of_mass, inertias):
+            self.inertial_dict[name] = {'name': name, 'mass': mass,
+                                        'center_of_mass': center_of_mass,
+                                        'inertia': inertia}
 
-    def _is_joint_valid(self, joint):
+    def _is_joint_valid(self, geo_one, geo_two):
         '''_summary_
         Parameters
         ----------
-        joint : _type_
-            _description_
+        geo_one : _type_
+            geometryOrOriginOne of the joint
+        geo_two : _type_
+            geometryOrOriginTwo of the joint
         '''
 
-        try: 
-            joint.geometryOrOriginOne.origin.asArray()
-            joint.geometryOrOriginTwo.origin.asArray()
-            return True 
-        
+        try:
+            geo_one.origin.asArray()
+            geo_two.origin.asArray()
+            return True
+
         except:
             return False
 
@@ -341,13 +365,21 @@ class Configurator:
     def _joints(self):
         ''' Iterates over joints list and defines properties for each joint
         (along with its relationship)
-        
-        '''        
+
+        '''
+
+        joint_type_list = Configurator.joint_type_list
 
         for joint in self.root.joints:
-            
+
+            # bind the per-joint fusion objects once; every attribute chain
+            # below is a separate api round-trip otherwise
+            motion = joint.jointMotion
+            geo_one = joint.geometryOrOriginOne
+            geo_two = joint.geometryOrOriginTwo
+
             joint_dict = {}
-            joint_type = Configurator.joint_type_list[joint.jointMotion.jointType]
+            joint_type = joint_type_list[motion.jointType]
             joint_dict['type'] = joint_type
 
             # switch by the type of the joint
@@ -357,16 +389,16 @@ class Configurator:
 
             occ_one = joint.occurrenceOne
             occ_two = joint.occurrenceTwo
-            
+
             # Check that both bodies are valid (e.g. there is no missing reference)
-            if not self._is_joint_valid(joint):
+            if not self._is_joint_valid(geo_one, geo_two):
                 # TODO: Handle in a better way (like warning message)
                 continue
 
-            geom_one_origin = joint.geometryOrOriginOne.origin.asArray()
-            geom_one_primary = joint.geometryOrOriginOne.primaryAxisVector.asArray()
-            geom_one_secondary = joint.geometryOrOriginOne.secondaryAxisVector.asArray()
-            geom_one_third = joint.geometryOrOriginOne.thirdAxisVector.asArray()
+            geom_one_origin = geo_one.origin.asArray()
+            geom_one_primary = geo_one.primaryAxisVector.asArray()
+            geom_one_secondary = geo_one.secondaryAxisVector.asArray()
+            geom_one_third = geo_one.thirdAxisVector.asArray()
 
             # Check if this is already top level
             # Check if the parent_list only contains one entity
@@ -389,24 +421,25 @@ class Configurator:
                 # reset occurrence two
                 occ_two = self.component_map[parent_list[-2]].component
 
-            geom_two_origin = joint.geometryOrOriginTwo.origin.asArray()
-            geom_two_primary = joint.geometryOrOriginTwo.primaryAxisVector.asArray()
-            geom_two_secondary = joint.geometryOrOriginTwo.secondaryAxisVector.asArray()
-            geom_two_third = joint.geometryOrOriginTwo.thirdAxisVector.asArray()
-            
-            joint_type = joint.jointMotion.objectType # string 
-            
-            # Only Revolute joints have rotation axis 
+            geom_two_origin = geo_two.origin.asArray()
+            geom_two_primary = geo_two.primaryAxisVector.asArray()
+            geom_two_secondary = geo_two.secondaryAxisVector.asArray()
+            geom_two_third = geo_two.thirdAxisVector.asArray()
+
+            joint_type = motion.objectType # string
+
+            # Only Revolute joints have rotation axis
             if 'RigidJointMotion' in joint_type:
                 pass
             else:
-                
-                joint_vector = joint.jointMotion.rotationAxisVector.asArray() 
 
-                joint_rot_val = joint.jointMotion.rotationValue
-                joint_limit_max = joint.jointMotion.rotationLimits.maximumValue
-                joint_limit_min = joint.jointMotion.rotationLimits.minimumValue
-                
+                joint_vector = motion.rotationAxisVector.asArray()
+
+                joint_rot_val = motion.rotationValue
+                rotation_limits = motion.rotationLimits
+                joint_limit_max = rotation_limits.maximumValue
+                joint_limit_min = rotation_limits.minimumValue
+
                 if abs(joint_limit_max - joint_limit_min) == 0:
                     joint_limit_min = -3.14159
                     joint_limit_max = 3.14159
@@ -440,33 +473,28 @@ class Configurator:
 
         self.body_dict = defaultdict(list) # key : occurrence name -> value : list of bodies under that occurrence
         body_dict_urdf = defaultdict(list) # list to send to parts.py
-        duplicate_bodies = defaultdict(int) # key : name -> value : # of instances
 
         oc_name = ''
         # Make sure no repeated body names
         body_count = Counter()
         
         for oc in self.occ:
-            oc_name = oc.name.replace(':','_').replace(' ','')
+            oc_name = utils.format_name(oc.name)
             # self.body_dict[oc_name] = []
             # body_lst = self.component_map[oc.entityToken].get_flat_body() #gets list of all bodies in the occurrence
 
-            body_lst = self.body_mapper[oc.entityToken]
-            
-            if len(body_lst) > 0:
-                for body in body_lst:
-                    # Check if this body is hidden
-                    if body.isLightBulbOn:
-                        if body.name in duplicate_bodies:
-                            duplicate_bodies[body.name] +=1
-                        self.body_dict[oc_name].append(body)
-
-                        body_name = body.name.replace(':','_').replace(' ','')
-                        body_name_cnt = f'{body_name}_{body_count[body_name]}'
-                        body_count[body_name] += 1
-
-                        unique_bodyname = f'{oc_name}_{body_name_cnt}'
-                        body_dict_urdf[oc_name].append(unique_bodyname)
+            # body_mapper only ever holds visible bodies (the lightbulb
+            # filter runs once in get_sub_bodies), so no per-body visibility
+            # re-probe is needed here
+            for body in self.body_mapper[oc.entityToken]:
+                self.body_dict[oc_name].append(body)
+
+                body_name = utils.format_name(body.name)
+                body_name_cnt = f'{body_name}_{body_count[body_name]}'
+                body_count[body_name] += 1
+
+                unique_bodyname = f'{oc_name}_{body_name_cnt}'
+                body_dict_urdf[oc_name].append(unique_bodyname)
                     
         # Make the actual urdf names accessible
         self.body_dict_urdf = body_dict_urdf
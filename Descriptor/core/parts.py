@@ -7,16 +7,30 @@ Created on Sun May 12 20:17:17 2019
 Modified by cadop Dec 19 2021
 """
 
-from xml.etree.ElementTree import Element, SubElement
-from xml.etree import ElementTree
-from xml.dom import minidom
+from io import StringIO
+# bound once at import; quoteattr returns the value wrapped in quotes,
+# escaping anything a Fusion document name could sneak into an attribute
+from xml.sax.saxutils import quoteattr as _qa
+
+from . import utils
+
+# joint types that carry an axis / limits in the urdf
+_AXIS_TYPES = frozenset({'revolute', 'continuous', 'prismatic'})
+_LIMIT_TYPES = frozenset({'revolute', 'prismatic'})
 
 class Joint:
 
-    # Defaults for all joints 
+    __slots__ = ('name', 'type', 'xyz', 'parent', 'child',
+                 '_joint_xml', '_tran_xml', 'axis', 'upper_limit', 'lower_limit')
+
+    # Defaults for all joints
     effort_limit = 100
     vel_limit = 100
 
+    # <transmission> blocks only matter for ros_control targets; the
+    # manager clears this for platforms that would ignore them
+    emit_transmissions = True
+
     def __init__(self, name, xyz, axis, parent, child, joint_type, upper_limit, lower_limit):
         """
         Attributes
@@ -52,76 +66,78 @@ class Joint:
     @property
     def joint_xml(self):
         """
-        Generate the joint_xml and hold it by self.joint_xml
+        Generate the joint_xml once and return the cached string afterwards
         """
 
-        joint = Element('joint')
-        joint.attrib = {'name':self.name.replace(':','_').replace(' ',''), 'type':self.type}
+        if self._joint_xml is not None:
+            return self._joint_xml
 
-        origin = SubElement(joint, 'origin')
-        origin.attrib = {'xyz':' '.join([str(_) for _ in self.xyz]), 'rpy':'0 0 0'}
+        # The fragment has a fixed shape, so it is assembled directly as
+        # strings; no element tree to build and serialize
+        name = utils.format_name(self.name)
+        # always a 3-vector; formatting directly skips the join machinery
+        xyz = f'{self.xyz[0]} {self.xyz[1]} {self.xyz[2]}'
+        parent = utils.format_name(self.parent)
+        child = utils.format_name(self.child)
 
-        parent = SubElement(joint, 'parent')
-        self.parent = self.parent.replace(':','_').replace(' ','')
-        parent.attrib = {'link':self.parent}
+        lines = [f'<joint name={_qa(name)} type="{self.type}">',
+                 f'  <origin xyz="{xyz}" rpy="0 0 0"/>',
+                 f'  <parent link={_qa(parent)}/>',
+                 f'  <child link={_qa(child)}/>']
 
-        child = SubElement(joint, 'child')
-        self.child = self.child.replace(':','_').replace(' ','')
-        child.attrib = {'link':self.child}
+        if self.type in _AXIS_TYPES:
+            axis = f'{self.axis[0]} {self.axis[1]} {self.axis[2]}'
+            lines.append(f'  <axis xyz="{axis}"/>')
+        if self.type in _LIMIT_TYPES:
+            lines.append(f'  <limit upper="{self.upper_limit}" lower="{self.lower_limit}" '
+                         f'effort="{Joint.effort_limit}" velocity="{Joint.vel_limit}"/>')
 
-        if self.type == 'revolute' or self.type == 'continuous' or self.type == 'prismatic':        
-            axis = SubElement(joint, 'axis')
-            axis.attrib = {'xyz':' '.join([str(_) for _ in self.axis])}
-        if self.type == 'revolute' or self.type == 'prismatic':
-            limit = SubElement(joint, 'limit')
-            limit.attrib = {'upper': str(self.upper_limit), 'lower': str(self.lower_limit),
-                            'effort': f'{Joint.effort_limit}', 'velocity': f'{Joint.vel_limit}'}
-
-        rough_string = ElementTree.tostring(joint, 'utf-8')
-        reparsed = minidom.parseString(rough_string)
-        self._joint_xml = "\n".join(reparsed.toprettyxml(indent="  ").split("\n")[1:])
+        lines.append('</joint>\n')
+        self._joint_xml = '\n'.join(lines)
 
         return self._joint_xml
 
     @property
     def transmission_xml(self):
         """
-        Generate the tran_xml and hold it by self.tran_xml
-        
-        
+        Generate the tran_xml once and return the cached string afterwards
+
+
         Notes
         -----------
         mechanicalTransmission: 1
         type: transmission interface/SimpleTransmission
-        hardwareInterface: PositionJointInterface        
-        """        
-        
-        tran = Element('transmission')
-        tran.attrib = {'name':self.name.replace(':','_').replace(' ','') + '_tran'}
-        
-        joint_type = SubElement(tran, 'type')
-        joint_type.text = 'transmission_interface/SimpleTransmission'
-        
-        joint = SubElement(tran, 'joint')
-        joint.attrib = {'name':self.name.replace(':','_').replace(' ','')}
-        hardwareInterface_joint = SubElement(joint, 'hardwareInterface')
-        hardwareInterface_joint.text = 'hardware_interface/EffortJointInterface'
-        
-        actuator = SubElement(tran, 'actuator')
-        actuator.attrib = {'name':self.name.replace(':','_').replace(' ','') + '_actr'}
-        hardwareInterface_actr = SubElement(actuator, 'hardwareInterface')
-        hardwareInterface_actr.text = 'hardware_interface/EffortJointInterface'
-        mechanicalReduction = SubElement(actuator, 'mechanicalReduction')
-        mechanicalReduction.text = '1'
+        hardwareInterface: PositionJointInterface
+        """
+
+        if not Joint.emit_transmissions:
+            return ''
+
+        if self._tran_xml is not None:
+            return self._tran_xml
+
+        name = utils.format_name(self.name)
 
-        rough_string = ElementTree.tostring(tran, 'utf-8')
-        reparsed = minidom.parseString(rough_string)
-        self._tran_xml  = "\n".join(reparsed.toprettyxml(indent="  ").split("\n")[1:])
+        self._tran_xml = (
+            f'<transmission name={_qa(f"{name}_tran")}>\n'
+            f'  <type>transmission_interface/SimpleTransmission</type>\n'
+            f'  <joint name={_qa(name)}>\n'
+            f'    <hardwareInterface>hardware_interface/EffortJointInterface</hardwareInterface>\n'
+            f'  </joint>\n'
+            f'  <actuator name={_qa(f"{name}_actr")}>\n'
+            f'    <hardwareInterface>hardware_interface/EffortJointInterface</hardwareInterface>\n'
+            f'    <mechanicalReduction>1</mechanicalReduction>\n'
+            f'  </actuator>\n'
+            f'</transmission>\n'
+        )
 
         return self._tran_xml
 
 class Link:
 
+    __slots__ = ('name', 'xyz', 'center_of_mass', '_link_xml', 'sub_folder',
+                 'mass', 'inertia_tensor', 'body_dict', 'sub_mesh')
+
     mesh_scale = '0.001'
 
     def __init__(self, name, xyz, center_of_mass, sub_folder, mass, inertia_tensor, body_dict, sub_mesh):
@@ -164,56 +180,56 @@ class Link:
     @property
     def link_xml(self):
         """
-        Generate the link_xml and hold it by self.link_xml
+        Generate the link_xml once and return the cached string afterwards
         """
-        
-        link = Element('link')
-        self.name = self.name.replace(':','_').replace(' ','')
-        link.attrib = {'name':self.name}
-        
-        #inertial
-        inertial = SubElement(link, 'inertial')
-        origin_i = SubElement(inertial, 'origin')
-        origin_i.attrib = {'xyz':' '.join([str(_) for _ in self.center_of_mass]), 'rpy':'0 0 0'}       
-        mass = SubElement(inertial, 'mass')
-        mass.attrib = {'value':str(self.mass)}
-        inertia = SubElement(inertial, 'inertia')
-        inertia.attrib = {'ixx':str(self.inertia_tensor[0]), 'iyy':str(self.inertia_tensor[1]),
-                          'izz':str(self.inertia_tensor[2]), 'ixy':str(self.inertia_tensor[3]),
-                          'iyz':str(self.inertia_tensor[4]), 'ixz':str(self.inertia_tensor[5])}        
-        
+
+        if self._link_xml is not None:
+            return self._link_xml
+
+        name = utils.format_name(self.name)
+        # invariant across all the visual/collision entries below; locals
+        # also keep the loop free of repeated attribute lookups
+        xyz = f'{self.xyz[0]} {self.xyz[1]} {self.xyz[2]}'
+        com = f'{self.center_of_mass[0]} {self.center_of_mass[1]} {self.center_of_mass[2]}'
+        scale = f'{Link.mesh_scale} {Link.mesh_scale} {Link.mesh_scale}'
+        it = self.inertia_tensor
+        sub_folder = self.sub_folder
+        bodies = self.body_dict.get(name) if self.sub_mesh else None
+
+        # Stream the fragment into one buffer; no element tree in between
+        buf = StringIO()
+        buf.write(f'<link name={_qa(name)}>\n'
+                  f'  <inertial>\n'
+                  f'    <origin xyz="{com}" rpy="0 0 0"/>\n'
+                  f'    <mass value="{self.mass}"/>\n'
+                  f'    <inertia ixx="{it[0]}" iyy="{it[1]}" izz="{it[2]}" '
+                  f'ixy="{it[3]}" iyz="{it[4]}" ixz="{it[5]}"/>\n'
+                  f'  </inertial>\n')
+
+        # one emitter covers the visual and collision variants; only the
+        # tag, the stl basename and the material line differ
+        def _emit(tag, stl_name, material):
+            frag = (f'  <{tag}>\n'
+                    f'    <origin xyz="{xyz}" rpy="0 0 0"/>\n'
+                    f'    <geometry>\n'
+                    f'      <mesh filename={_qa(f"package://{sub_folder}{stl_name}.stl")} scale="{scale}"/>\n'
+                    f'    </geometry>\n')
+            if material:
+                frag += '    <material name="silver"/>\n'
+            return f'{frag}  </{tag}>\n'
+
         # visual
-        if self.sub_mesh: # if we want to export each as a separate mesh
-            for body_name in self.body_dict[self.name]:
-                # body_name = body_name.replace(':','_').replace(' ','')
-                visual = SubElement(link, 'visual')
-                origin_v = SubElement(visual, 'origin')
-                origin_v.attrib = {'xyz':' '.join([str(_) for _ in self.xyz]), 'rpy':'0 0 0'}
-                geometry_v = SubElement(visual, 'geometry')
-                mesh_v = SubElement(geometry_v, 'mesh')
-                mesh_v.attrib = {'filename':f'package://{self.sub_folder}{body_name}.stl','scale':f'{Link.mesh_scale} {Link.mesh_scale} {Link.mesh_scale}'}
-                material = SubElement(visual, 'material')
-                material.attrib = {'name':'silver'}
+        if bodies: # if we want to export each as a separate mesh
+            # body names in body_dict are already formatted by the parser;
+            # no per-body normalization needed here
+            for body_name in bodies:
+                buf.write(_emit('visual', body_name, True))
         else:
-            visual = SubElement(link, 'visual')
-            origin_v = SubElement(visual, 'origin')
-            origin_v.attrib = {'xyz':' '.join([str(_) for _ in self.xyz]), 'rpy':'0 0 0'}
-            geometry_v = SubElement(visual, 'geometry')
-            mesh_v = SubElement(geometry_v, 'mesh')
-            mesh_v.attrib = {'filename':f'package://{self.sub_folder}{self.name}.stl','scale':f'{Link.mesh_scale} {Link.mesh_scale} {Link.mesh_scale}'}
-            material = SubElement(visual, 'material')
-            material.attrib = {'name':'silver'}
-    
-        
+            buf.write(_emit('visual', name, True))
+
         # collision
-        collision = SubElement(link, 'collision')
-        origin_c = SubElement(collision, 'origin')
-        origin_c.attrib = {'xyz':' '.join([str(_) for _ in self.xyz]), 'rpy':'0 0 0'}
-        geometry_c = SubElement(collision, 'geometry')
-        mesh_c = SubElement(geometry_c, 'mesh')
-        mesh_c.attrib = {'filename':'package://' + self.sub_folder + self.name + '.stl','scale':'0.001 0.001 0.001'}
-
-        rough_string = ElementTree.tostring(link, 'utf-8')
-        reparsed = minidom.parseString(rough_string)
-        self._link_xml  = "\n".join(reparsed.toprettyxml(indent="  ").split("\n")[1:])
+        buf.write(_emit('collision', name, False))
+        buf.write('</link>\n')
+
+        self._link_xml = buf.getvalue()
         return self._link_xml
@@ -1,8 +1,22 @@
 
 
+# numpy and numba are tried separately: fusion's embedded python usually
+# ships numpy but not numba, and the vectorized batch path only needs the
+# former. Missing pieces fall back to the pure python math below.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
 def origin2center_of_mass(inertia, center_of_mass, mass):
     """
-    convert the moment of the inertia about the world coordinate into 
+    convert the moment of the inertia about the world coordinate into
     that about center of mass coordinate
 
 
@@ -10,15 +24,70 @@ def origin2center_of_mass(inertia, center_of_mass, mass):
     ----------
     moment of inertia about the world coordinate:  [xx, yy, zz, xy, yz, xz]
     center_of_mass: [x, y, z]
-    
-    
+
+
     Returns
     ----------
     moment of inertia about center of mass : [xx, yy, zz, xy, yz, xz]
     """
+    if _shift_inertia is not None:
+        shifted = _shift_inertia(np.asarray(inertia, dtype=np.float64),
+                                 np.asarray(center_of_mass, dtype=np.float64),
+                                 float(mass))
+        return [round(v, 6) for v in shifted]
+
     x = center_of_mass[0]
     y = center_of_mass[1]
     z = center_of_mass[2]
     translation_matrix = [y**2+z**2, x**2+z**2, x**2+y**2,
                                -x*y,      -y*z,       -x*z]
     return [ round(i - mass*t, 6) for i, t in zip(inertia, translation_matrix)]
+
+
+def batch_origin2center_of_mass(inertias, centers_of_mass, masses):
+    """
+    vectorized origin2center_of_mass over parallel lists, one row per
+    occurrence. Falls back to the scalar function when numpy is missing.
+
+    Parameters
+    ----------
+    inertias: list of [xx, yy, zz, xy, yz, xz] about the world coordinate
+    centers_of_mass: list of [x, y, z]
+    masses: list of float
+
+    Returns
+    ----------
+    list of moments of inertia about the centers of mass
+    """
+    if np is None or not masses:
+        return [origin2center_of_mass(i, c, m)
+                for i, c, m in zip(inertias, centers_of_mass, masses)]
+
+    inertia_arr = np.asarray(inertias, dtype=np.float64)
+    com = np.asarray(centers_of_mass, dtype=np.float64)
+    mass = np.asarray(masses, dtype=np.float64)[:, None]
+    x = com[:, 0]
+    y = com[:, 1]
+    z = com[:, 2]
+    translation = np.stack([y*y + z*z, x*x + z*z, x*x + y*y,
+                            -x*y, -y*z, -x*z], axis=1)
+    return np.round(inertia_arr - mass*translation, 6).tolist()
+
+
+if njit is None:
+    _shift_inertia = None
+else:
+    @njit(cache=True)
+    def _shift_inertia(inertia, com, mass):
+        ''' parallel-axis shift of the 6-element inertia vector, compiled '''
+        x = com[0]
+        y = com[1]
+        z = com[2]
+        out = np.empty(6)
+        out[0] = inertia[0] - mass*(y*y + z*z)
+        out[1] = inertia[1] - mass*(x*x + z*z)
+        out[2] = inertia[2] - mass*(x*x + y*y)
+        out[3] = inertia[3] + mass*x*y
+        out[4] = inertia[4] + mass*y*z
+        out[5] = inertia[5] + mass*x*z
+        return out
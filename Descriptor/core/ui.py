@@ -3,8 +3,6 @@
 import adsk
 import adsk.core, adsk.fusion, traceback
 
-from . import manager
-
 def file_dialog(ui):     
     '''display the dialog to save the file
 
@@ -33,8 +31,38 @@ def file_dialog(ui):
 class MyInputChangedHandler(adsk.core.InputChangedEventHandler):
     def __init__(self, ui):
         self.ui = ui
+        # last Manager instance and the UI values it was built from; the
+        # Manager caches its configured scene, so reusing it is what lets
+        # preview followed by generate walk the occurrence tree once
+        self._cached_key = None
+        self._cached_mgr = None
         super().__init__()
 
+    def _get_manager(self, directory_path, save_mesh, sub_mesh, mesh_resolution,
+                     inertia_precision, document_units, target_units, joint_order,
+                     target_platform):
+        ''' Return a Manager for the current UI settings, reusing the last
+        one when no input changed between clicks
+
+        Returns
+        -------
+        manager.Manager
+            manager configured from the current inputs
+        '''
+        # deferred so Fusion doesn't pay for the parser import chain on
+        # every session; it only loads once a button is actually clicked
+        from . import manager
+
+        key = (directory_path.text, save_mesh.value, sub_mesh.value,
+               mesh_resolution.selectedItem.name, inertia_precision.selectedItem.name,
+               document_units.selectedItem.name, target_units.selectedItem.name,
+               joint_order.selectedItem.name, target_platform.selectedItem.name)
+
+        if key != self._cached_key:
+            self._cached_mgr = manager.Manager(*key)
+            self._cached_key = key
+        return self._cached_mgr
+
     def notify(self, args):
         try:
             cmd = args.firingEvent.sender
@@ -58,32 +86,32 @@ class MyInputChangedHandler(adsk.core.InputChangedEventHandler):
                 #         {inertia_precision.selectedItem.name}, {document_units.selectedItem.name},\
                 #         {target_units.selectedItem.name}, {joint_order.selectedItem.name}' )
 
-                document_manager = manager.Manager(directory_path.text, save_mesh.value, sub_mesh.value,
-                                                   mesh_resolution.selectedItem.name, 
-                                                   inertia_precision.selectedItem.name, 
-                                                   document_units.selectedItem.name, 
-                                                   target_units.selectedItem.name, 
-                                                   joint_order.selectedItem.name, 
-                                                   target_platform.selectedItem.name)
-                
+                document_manager = self._get_manager(directory_path, save_mesh, sub_mesh,
+                                                     mesh_resolution, inertia_precision,
+                                                     document_units, target_units,
+                                                     joint_order, target_platform)
+
                 # Generate
                 document_manager.run()
 
             elif cmdInput.id == 'preview':
                 # Generate Hierarchy and Preview in panel
-                document_manager = manager.Manager(directory_path.text, save_mesh.value, sub_mesh.value, mesh_resolution.selectedItem.name, 
-                                                   inertia_precision.selectedItem.name, document_units.selectedItem.name, target_units.selectedItem.name, 
-                                                   joint_order.selectedItem.name, target_platform.selectedItem.name)
+                document_manager = self._get_manager(directory_path, save_mesh, sub_mesh,
+                                                     mesh_resolution, inertia_precision,
+                                                     document_units, target_units,
+                                                     joint_order, target_platform)
                 # # Generate
                 _joints = document_manager.preview()
 
                 joints_text = inputs.itemById('jointlist')
 
-                _txt = 'joint name: parent link-> child link\n'
-
+                # collect the lines and join once; += on a string is
+                # quadratic over large joint lists
+                _lines = ['joint name: parent link-> child link']
                 for k, j in _joints.items():
-                    _txt += f'{k} : {j["parent"]} -> {j["child"]}\n' 
-                joints_text.text = _txt
+                    _lines.append(f'{k} : {j["parent"]} -> {j["child"]}')
+                _lines.append('')
+                joints_text.text = '\n'.join(_lines)
 
             elif cmdInput.id == 'save_dir':
                 # User set the save directory
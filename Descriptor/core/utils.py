@@ -0,0 +1,23 @@
+''' module: helper utilities shared across the core modules '''
+
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def format_name(name):
+    ''' Sanitize a fusion name for use in filenames and urdf identifiers
+
+    Cached since the same occurrence and body names are formatted
+    repeatedly across the export passes.
+
+    Parameters
+    ----------
+    name : str
+        name as it appears in the fusion document
+
+    Returns
+    -------
+    str
+        name with separators replaced and spaces removed
+    '''
+    return name.replace(':', '_').replace(' ', '')